@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi import Request
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import time
 import logging
 from datetime import datetime
@@ -37,13 +39,24 @@ error_handler = None
 ai_validator = None
 duplicate_remover = None
 confidence_scorer = None
+prewarm_task = None
+
+
+def load_prewarm_queries(path: str) -> List[tuple]:
+    """Read popular searches as a JSON list of [query, country] pairs"""
+    try:
+        with open(path) as f:
+            return [(query, country) for query, country in json.load(f)]
+    except Exception as e:
+        logger.warning(f"Could not load prewarm queries from {path}: {str(e)}")
+        return []
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     global serpapi_client, openai_client, data_parser, error_handler
-    global ai_validator, duplicate_remover, confidence_scorer
+    global ai_validator, duplicate_remover, confidence_scorer, prewarm_task
 
     logger.info("Starting PricePilot API - Phase 3...")
     openai_key = os.getenv("OPENAI_API_KEY")
@@ -87,6 +100,16 @@ async def lifespan(app: FastAPI):
         logger.info(f"Confidence Scorer: Success")
         logger.info(f"Error Handler: Success")
 
+        # Warm the search cache with popular queries in the background so
+        # startup isn't delayed
+        prewarm_file = os.getenv("SERPAPI_PREWARM_FILE")
+        if prewarm_file:
+            prewarm_queries = load_prewarm_queries(prewarm_file)
+            if prewarm_queries:
+                prewarm_task = asyncio.create_task(
+                    serpapi_client.prewarm(prewarm_queries)
+                )
+
         logger.info("PricePilot API Phase 3 startup complete!")
 
     except Exception as e:
@@ -96,6 +119,10 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("PricePilot API shutting down...")
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+    if serpapi_client is not None:
+        await serpapi_client.aclose()
 
 
 # Create FastAPI app
@@ -319,7 +346,9 @@ async def search_products_ai_enhanced(
 
         # Step 1: Execute multi-source search (Phase 2)
         logger.info("📡 Step 1: Executing worldwide search...")
-        raw_results = await serpapi.search_all_sources(query.query, query.country)
+        raw_results = await serpapi.search_all_sources(
+            query.query, query.country, query.mode
+        )
 
         # Step 2: Parse and normalize results (Phase 2)
         logger.info("Step 2: Parsing and normalizing results...")
@@ -438,7 +467,9 @@ async def search_products_basic(
         logger.info(f"Starting basic search: '{query.query}' in {query.country}")
 
         # Execute Phase 2 search pipeline
-        raw_results = await serpapi.search_all_sources(query.query, query.country)
+        raw_results = await serpapi.search_all_sources(
+            query.query, query.country, query.mode
+        )
         parsed_products = parser.parse_all_results(raw_results, query.country)
 
         # Basic validation and formatting
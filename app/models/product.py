@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
 from enum import Enum
+from dataclasses import dataclass
 
 
 class CountryCode(str, Enum):
@@ -21,6 +22,66 @@ class CountryCode(str, Enum):
     NL = "NL"
 
 
+class SearchMode(str, Enum):
+    """How long a search waits for slower sources"""
+
+    FAST = "fast"
+    NORMAL = "normal"
+
+
+def _to_float(value: Any) -> float:
+    """Coerce a score that may be missing or a string (LLM output) to float"""
+    try:
+        return float(value or 0.0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+@dataclass(slots=True)
+class Product:
+    """Compact product record used by the parser and duplicate remover"""
+
+    link: str
+    price: str
+    currency: str
+    productName: str
+    website: str
+    rating: str
+    availability: str
+    image_url: str
+    ai_validated: bool = False
+    ai_confidence_score: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Product":
+        """Build from a pipeline product dict (extra keys are ignored)"""
+        return cls(
+            link=data.get("link") or "",
+            price=data.get("price") or "",
+            currency=data.get("currency") or "",
+            productName=data.get("productName") or "",
+            website=data.get("website") or "",
+            rating=data.get("rating") or "",
+            availability=data.get("availability") or "",
+            image_url=data.get("image_url") or "",
+            ai_validated=bool(data.get("ai_validated", False)),
+            ai_confidence_score=_to_float(data.get("ai_confidence_score")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the parser's product dict (AI fields are read-only here)"""
+        return {
+            "link": self.link,
+            "price": self.price,
+            "currency": self.currency,
+            "productName": self.productName,
+            "website": self.website,
+            "rating": self.rating,
+            "availability": self.availability,
+            "image_url": self.image_url,
+        }
+
+
 class ProductQuery(BaseModel):
     """Product search query model"""
 
@@ -28,9 +89,15 @@ class ProductQuery(BaseModel):
         ..., min_length=1, max_length=200, description="Product search query"
     )
     country: CountryCode = Field(..., description="Country code for localized search")
+    mode: SearchMode = Field(
+        default=SearchMode.NORMAL,
+        description="'fast' returns once Google Shopping has enough results",
+    )
 
     class Config:
-        schema_extra = {"example": {"query": "iPhone 16 Pro 128GB", "country": "US"}}
+        schema_extra = {
+            "example": {"query": "iPhone 16 Pro 128GB", "country": "US", "mode": "normal"}
+        }
 
 
 class ProductResult(BaseModel):
@@ -2,11 +2,10 @@ import logging
 from typing import List, Dict, Optional, Tuple
 import json
 import asyncio
-from openai import AsyncOpenAI
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from app.services.openai_client import get_request_semaphore
+
 logger = logging.getLogger(__name__)
 
 class AIProductValidator:
@@ -24,9 +23,17 @@ class AIProductValidator:
     """
     
     def __init__(self):
+        # Imported here so modules that never build a client skip the cost
+        from openai import AsyncOpenAI
+        from dotenv import load_dotenv
+        
+        load_dotenv()
         self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = "gpt-4o-mini"  # Fast and cost-effective
         
+        # Batches are validated concurrently, sharing OpenAIClient's cap
+        self._semaphore = get_request_semaphore()
+        
         # Validation prompt template
         self.validation_prompt = """
 You are a product validation expert. Analyze if these search results match the user's query.
@@ -43,17 +50,19 @@ For each product, determine:
 3. CONFIDENCE: Overall confidence this is a good match (0-100)
 4. REASON: Brief explanation of your decision
 
-Return ONLY a JSON array with this exact format:
-[
-  {{
-    "original_index": 0,
-    "relevance_score": 85,
-    "clean_name": "Apple iPhone 16 Pro 128GB",
-    "confidence_score": 90,
-    "is_relevant": true,
-    "reason": "Exact match for iPhone 16 Pro"
-  }}
-]
+Return ONLY a JSON object with this exact format:
+{{
+  "results": [
+    {{
+      "original_index": 0,
+      "relevance_score": 85,
+      "clean_name": "Apple iPhone 16 Pro 128GB",
+      "confidence_score": 90,
+      "is_relevant": true,
+      "reason": "Exact match for iPhone 16 Pro"
+    }}
+  ]
+}}
 
 Rules:
 - Only include products with relevance_score >= 60
@@ -89,14 +98,22 @@ Rules:
                     "link": product.get("link", "")[:100]  # Truncate long URLs
                 })
             
-            # Split into batches if too many products (AI has token limits)
-            batch_size = 10
-            validated_products = []
+            # Send as many products per request as the token limits allow;
+            # each batch is one network round-trip
+            batch_size = 25
+            batches = [
+                products_for_ai[i:i + batch_size]
+                for i in range(0, len(products_for_ai), batch_size)
+            ]
             
-            for i in range(0, len(products_for_ai), batch_size):
-                batch = products_for_ai[i:i + batch_size]
-                batch_results = await self._validate_batch(batch, query, country)
-                
+            async def _bounded(batch: List[Dict]) -> List[Dict]:
+                async with self._semaphore:
+                    return await self._validate_batch(batch, query, country)
+            
+            all_batch_results = await asyncio.gather(*(_bounded(batch) for batch in batches))
+            
+            validated_products = []
+            for batch_results in all_batch_results:
                 # Merge AI results back with original product data
                 for ai_result in batch_results:
                     original_index = ai_result.get("original_index", 0)
@@ -117,10 +134,6 @@ Rules:
                             enhanced_product["productName"] = ai_result["clean_name"]
                         
                         validated_products.append(enhanced_product)
-                
-                # Small delay between batches to avoid rate limits
-                if i + batch_size < len(products_for_ai):
-                    await asyncio.sleep(0.5)
             
             # Filter to only relevant products
             relevant_products = [
@@ -159,26 +172,21 @@ Rules:
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a product validation expert. Return only valid JSON arrays."
+                        "content": "You are a product validation expert. Return only valid JSON objects."
                     },
                     {
                         "role": "user", 
                         "content": prompt
                     }
                 ],
+                response_format={"type": "json_object"},  # Guaranteed parseable JSON
                 temperature=0.1,  # Low temperature for consistent results
-                max_tokens=2000
+                max_tokens=4000
             )
             
             # Parse AI response
             ai_response = response.choices[0].message.content.strip()
-            
-            # Clean up response (remove markdown formatting if present)
-            if ai_response.startswith(""):
-                ai_response = ai_response.replace("json", "").replace("```", "").strip()
-            
-            # Parse JSON
-            validation_results = json.loads(ai_response)
+            validation_results = json.loads(ai_response).get("results", [])
             
             logger.debug(f"AI validated {len(validation_results)} products in batch")
             
@@ -1,10 +1,83 @@
 import re
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 import logging
 from urllib.parse import urlparse
 
+from app.models.product import Product
+
 logger = logging.getLogger(__name__)
 
+_PRICE_NOISE_RE = re.compile(r'(from|starting|as low as|up to|save|off|free shipping)')
+
+# Enhanced price patterns - more comprehensive
+_PRICE_PATTERNS = [
+    re.compile(r'(?i)[\$£€¥₹]\s*([0-9,]+\.?[0-9]*)'),  # Symbol first: $999.99
+    re.compile(r'(?i)([0-9,]+\.?[0-9]*)\s*[\$£€¥₹]'),  # Symbol last: 999.99$
+    re.compile(r'(?i)([0-9,]+\.?[0-9]*)\s*(USD|EUR|GBP|INR|JPY|CAD|AUD|BRL|MXN)'),  # With currency code
+    re.compile(r'(?i)Price:\s*[\$£€¥₹]?\s*([0-9,]+\.?[0-9]*)'),  # "Price: $999"
+    re.compile(r'(?i)([0-9,]+\.?[0-9]*)\s*dollars?'),  # "999 dollars"
+    re.compile(r'(?i)([0-9,]+\.?[0-9]*)\s*rupees?'),   # "999 rupees"
+    re.compile(r'([0-9,]+\.?[0-9]*)'),  # Just numbers (last resort)
+]
+
+_DOMAIN_PREFIX_RE = re.compile(r'^(www\.|m\.)')
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_ALNUM_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# Common noise patterns in product names
+_NAME_NOISE_RES = [
+    re.compile(r'(?i)\s*-\s*(Buy Online|Shop Now|Best Price|Free Shipping).*'),
+    re.compile(r'(?i)\s*\|\s*.*'),  # Remove everything after |
+    re.compile(r'(?i)\s*-\s*Amazon.*'),
+    re.compile(r'(?i)\s*-\s*eBay.*'),
+]
+
+# Currency markers checked in order; '$' is shared by USD/CAD/AUD/MXN so it
+# keeps the country default
+_CURRENCY_SYMBOLS = (('$', None), ('£', 'GBP'), ('€', 'EUR'), ('₹', 'INR'), ('¥', 'JPY'))
+_CURRENCY_CODES = ('USD', 'EUR', 'GBP', 'INR')
+
+
+def _detect_currency(price_text: str, currency_default: str) -> str:
+    """Override the country currency if a symbol/code is found in the text"""
+    for symbol, code in _CURRENCY_SYMBOLS:
+        if symbol in price_text:
+            return code or currency_default
+    
+    upper_text = price_text.upper()
+    for code in _CURRENCY_CODES:
+        if code in upper_text:
+            return code
+    
+    return currency_default
+
+
+@lru_cache(maxsize=8192)
+def _extract_price_cached(price_text: str, currency_default: str) -> Tuple[str, str]:
+    """Extract (price, currency) from text; memoized since price strings repeat a lot"""
+    # Convert to string and clean
+    price_text = price_text.strip()
+    
+    # Remove common noise
+    clean_text = _PRICE_NOISE_RE.sub('', price_text.lower())
+    
+    for pattern in _PRICE_PATTERNS:
+        match = pattern.search(clean_text)
+        if match:
+            price_num = match.group(1).replace(',', '')
+            
+            # Skip if price is too small (likely not a real price). The match is
+            # digits with an optional '.', so it is < 1 exactly when the integer
+            # part is empty or all zeros - no float() needed
+            if not price_num.split('.', 1)[0].strip('0'):
+                continue
+            
+            return price_num, _detect_currency(price_text, currency_default)
+    
+    return "", ""
+
+
 class ProductDataParser:
     """Enhanced parser with better error handling and Amazon/eBay support"""
     
@@ -22,24 +95,25 @@ class ProductDataParser:
         
         logger.info(f"Parsing results from {len(raw_results)} sources")
         
+        parsers = {
+            "google_shopping": self.parse_google_shopping,
+            "amazon": self.parse_amazon_enhanced,
+            "google_general": self.parse_google_general,
+            "ebay": self.parse_ebay_enhanced,
+        }
+        
         for source_name, source_data in raw_results.items():
             if "error" in source_data:
                 logger.warning(f"Skipping {source_name}: {source_data['error']}")
                 continue
             
+            parser = parsers.get(source_name)
+            if parser is None:
+                logger.warning(f"Unknown source: {source_name}")
+                continue
+            
             try:
-                if source_name == "google_shopping":
-                    products = self.parse_google_shopping(source_data, country)
-                elif source_name == "amazon":
-                    products = self.parse_amazon_enhanced(source_data, country)
-                elif source_name == "google_general":
-                    products = self.parse_google_general(source_data, country)
-                elif source_name == "ebay":
-                    products = self.parse_ebay_enhanced(source_data, country)
-                else:
-                    logger.warning(f"Unknown source: {source_name}")
-                    continue
-                
+                products = parser(source_data, country)
                 logger.info(f"Parsed {len(products)} products from {source_name}")
                 all_products.extend(products)
                 
@@ -51,9 +125,10 @@ class ProductDataParser:
         unique_products = self.remove_duplicates(all_products)
         logger.info(f"📦 Total unique products: {len(unique_products)}")
         
-        return unique_products
+        # Downstream services work on plain dicts
+        return [product.to_dict() for product in unique_products]
     
-    def parse_google_shopping(self, data: Dict, country: str) -> List[Dict]:
+    def parse_google_shopping(self, data: Dict, country: str) -> List[Product]:
         """Parse Google Shopping results"""
         products = []
         shopping_results = data.get('shopping_results', [])
@@ -65,16 +140,16 @@ class ProductDataParser:
                 if not price_info['price']:
                     continue
                 
-                product = {
-                    "link": item.get('link', ''),
-                    "price": price_info['price'],
-                    "currency": price_info['currency'],
-                    "productName": item.get('title', ''),
-                    "website": self.extract_website_name(item.get('source', '')),
-                    "rating": str(item.get('rating', '')),
-                    "availability": "In Stock",
-                    "image_url": item.get('thumbnail', '')
-                }
+                product = Product(
+                    link=item.get('link', ''),
+                    price=price_info['price'],
+                    currency=price_info['currency'],
+                    productName=item.get('title', ''),
+                    website=self.extract_website_name(item.get('source', '')),
+                    rating=str(item.get('rating', '')),
+                    availability="In Stock",
+                    image_url=item.get('thumbnail', '')
+                )
                 
                 if self.is_valid_product(product):
                     products.append(product)
@@ -85,7 +160,7 @@ class ProductDataParser:
         
         return products
     
-    def parse_amazon_enhanced(self, data: Dict, country: str) -> List[Dict]:
+    def parse_amazon_enhanced(self, data: Dict, country: str) -> List[Product]:
         """Enhanced Amazon parser with multiple result formats"""
         products = []
         
@@ -129,16 +204,16 @@ class ProductDataParser:
                     item.get('product_name', '')
                 )
                 
-                product = {
-                    "link": item.get('link', ''),
-                    "price": price_info['price'],
-                    "currency": price_info['currency'],
-                    "productName": self.clean_product_name(title),
-                    "website": "Amazon",
-                    "rating": str(item.get('rating', '') or item.get('reviews', {}).get('rating', '')),
-                    "availability": item.get('availability', 'Available'),
-                    "image_url": item.get('image', '') or item.get('thumbnail', '')
-                }
+                product = Product(
+                    link=item.get('link', ''),
+                    price=price_info['price'],
+                    currency=price_info['currency'],
+                    productName=self.clean_product_name(title),
+                    website="Amazon",
+                    rating=str(item.get('rating', '') or item.get('reviews', {}).get('rating', '')),
+                    availability=item.get('availability', 'Available'),
+                    image_url=item.get('image', '') or item.get('thumbnail', '')
+                )
                 
                 if self.is_valid_product(product):
                     products.append(product)
@@ -150,7 +225,7 @@ class ProductDataParser:
         logger.info(f"Amazon parser: Successfully parsed {len(products)} products")
         return products
     
-    def parse_google_general(self, data: Dict, country: str) -> List[Dict]:
+    def parse_google_general(self, data: Dict, country: str) -> List[Product]:
         """Parse Google general search results"""
         products = []
         organic_results = data.get('organic_results', [])
@@ -170,16 +245,16 @@ class ProductDataParser:
                 # Extract website name from URL
                 website_name = self.extract_website_name(item.get('link', ''))
                 
-                product = {
-                    "link": item.get('link', ''),
-                    "price": price_info['price'],
-                    "currency": price_info['currency'],
-                    "productName": self.clean_product_name(title),
-                    "website": website_name,
-                    "rating": "",
-                    "availability": "Check Website",
-                    "image_url": ""
-                }
+                product = Product(
+                    link=item.get('link', ''),
+                    price=price_info['price'],
+                    currency=price_info['currency'],
+                    productName=self.clean_product_name(title),
+                    website=website_name,
+                    rating="",
+                    availability="Check Website",
+                    image_url=""
+                )
                 
                 if self.is_valid_product(product):
                     products.append(product)
@@ -190,7 +265,7 @@ class ProductDataParser:
         
         return products
     
-    def parse_ebay_enhanced(self, data: Dict, country: str) -> List[Dict]:
+    def parse_ebay_enhanced(self, data: Dict, country: str) -> List[Product]:
         """Enhanced eBay parser with multiple result formats"""
         products = []
         
@@ -238,16 +313,16 @@ class ProductDataParser:
                 elif item.get('buy_it_now', False):
                     availability = "Buy It Now"
                 
-                product = {
-                    "link": item.get('link', ''),
-                    "price": price_info['price'],
-                    "currency": price_info['currency'],
-                    "productName": self.clean_product_name(title),
-                    "website": "eBay",
-                    "rating": str(item.get('rating', '') or item.get('seller_rating', '')),
-                    "availability": availability,
-                    "image_url": item.get('thumbnail', '') or item.get('image', '')
-                }
+                product = Product(
+                    link=item.get('link', ''),
+                    price=price_info['price'],
+                    currency=price_info['currency'],
+                    productName=self.clean_product_name(title),
+                    website="eBay",
+                    rating=str(item.get('rating', '') or item.get('seller_rating', '')),
+                    availability=availability,
+                    image_url=item.get('thumbnail', '') or item.get('image', '')
+                )
                 
                 if self.is_valid_product(product):
                     products.append(product)
@@ -264,61 +339,10 @@ class ProductDataParser:
         if not price_text:
             return {"price": "", "currency": ""}
         
-        # Convert to string and clean
-        price_text = str(price_text).strip()
-        
-        # Remove common noise
-        clean_text = re.sub(r'(from|starting|as low as|up to|save|off|free shipping)', '', price_text.lower())
-        
-        # Enhanced price patterns - more comprehensive
-        price_patterns = [
-            r'[\$£€¥₹]\s*([0-9,]+\.?[0-9]*)',  # Symbol first: $999.99
-            r'([0-9,]+\.?[0-9]*)\s*[\$£€¥₹]',  # Symbol last: 999.99$
-            r'([0-9,]+\.?[0-9]*)\s*(USD|EUR|GBP|INR|JPY|CAD|AUD|BRL|MXN)',  # With currency code
-            r'Price:\s*[\$£€¥₹]?\s*([0-9,]+\.?[0-9]*)',  # "Price: $999"
-            r'([0-9,]+\.?[0-9]*)\s*dollars?',  # "999 dollars"
-            r'([0-9,]+\.?[0-9]*)\s*rupees?',   # "999 rupees"
-            r'([0-9,]+\.?[0-9]*)',  # Just numbers (last resort)
-        ]
-        
-        for pattern in price_patterns:
-            match = re.search(pattern, clean_text, re.IGNORECASE)
-            if match:
-                price_num = match.group(1).replace(',', '')
-                
-                # Skip if price is too small (likely not a real price)
-                try:
-                    if float(price_num) < 1:
-                        continue
-                except ValueError:
-                    continue
-                
-                # Determine currency
-                currency = self.currency_codes.get(country, 'USD')
-                
-                # Override currency if symbol/code found in text
-                if '$' in price_text:
-                    currency = 'USD' if country == 'US' else self.currency_codes.get(country, 'USD')
-                elif '£' in price_text:
-                    currency = 'GBP'
-                elif '€' in price_text:
-                    currency = 'EUR'
-                elif '₹' in price_text:
-                    currency = 'INR'
-                elif '¥' in price_text:
-                    currency = 'JPY'
-                elif 'USD' in price_text.upper():
-                    currency = 'USD'
-                elif 'EUR' in price_text.upper():
-                    currency = 'EUR'
-                elif 'GBP' in price_text.upper():
-                    currency = 'GBP'
-                elif 'INR' in price_text.upper():
-                    currency = 'INR'
-                
-                return {"price": price_num, "currency": currency}
-        
-        return {"price": "", "currency": ""}
+        price, currency = _extract_price_cached(
+            str(price_text), self.currency_codes.get(country, 'USD')
+        )
+        return {"price": price, "currency": currency}
     
     def extract_website_name(self, url: str) -> str:
         """Extract clean website name from URL"""
@@ -330,7 +354,7 @@ class ProductDataParser:
             domain = parsed.netloc.lower()
             
             # Remove www. and common prefixes
-            domain = re.sub(r'^(www\.|m\.)', '', domain)
+            domain = _DOMAIN_PREFIX_RE.sub('', domain)
             
             # Extract main domain name
             domain_parts = domain.split('.')
@@ -349,32 +373,25 @@ class ProductDataParser:
             return ""
         
         # Remove excessive whitespace
-        name = re.sub(r'\s+', ' ', name.strip())
+        name = _WHITESPACE_RE.sub(' ', name.strip())
         
         # Remove common noise patterns
-        noise_patterns = [
-            r'\s*-\s*(Buy Online|Shop Now|Best Price|Free Shipping).*',
-            r'\s*\|\s*.*',  # Remove everything after |
-            r'\s*-\s*Amazon.*',
-            r'\s*-\s*eBay.*'
-        ]
-        
-        for pattern in noise_patterns:
-            name = re.sub(pattern, '', name, flags=re.IGNORECASE)
+        for pattern in _NAME_NOISE_RES:
+            name = pattern.sub('', name)
         
         return name.strip()
     
-    def is_valid_product(self, product: Dict) -> bool:
+    def is_valid_product(self, product: Product) -> bool:
         """Validate if product has minimum required information"""
-        return (
-            product.get('link') and 
-            product.get('productName') and 
-            product.get('price') and
-            len(product.get('productName', '')) > 3 and
-            product.get('link').startswith('http')
+        return bool(
+            product.link and
+            product.productName and
+            product.price and
+            len(product.productName) > 3 and
+            product.link.startswith('http')
         )
     
-    def remove_duplicates(self, products: List[Dict]) -> List[Dict]:
+    def remove_duplicates(self, products: List[Product]) -> List[Product]:
         """Remove duplicate products based on name similarity and price"""
         if not products:
             return []
@@ -384,8 +401,8 @@ class ProductDataParser:
         
         for product in products:
             # Create a key based on cleaned name and price
-            name_key = re.sub(r'[^a-zA-Z0-9]', '', product.get('productName', '').lower())[:20]
-            price_key = product.get('price', '')
+            name_key = _NON_ALNUM_RE.sub('', product.productName.lower())[:20]
+            price_key = product.price
             combination_key = f"{name_key}_{price_key}"
             
             if combination_key not in seen_combinations:
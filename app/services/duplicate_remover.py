@@ -1,8 +1,13 @@
 import logging
 from typing import List, Dict, Set, Optional  # Add Optional here
 import re
-from difflib import SequenceMatcher
+from functools import lru_cache
 from urllib.parse import urlparse
+import numpy as np
+from rapidfuzz import fuzz, process
+from scipy.cluster.hierarchy import DisjointSet
+
+from app.models.product import Product
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +30,24 @@ class DuplicateRemover:
         self.name_similarity_threshold = 0.8  # 80% similar names = duplicate
         self.price_similarity_threshold = 0.15  # 15% price difference = similar
         
+        # Common noise words stripped before comparing names
+        self.noise_words = [
+            "buy", "online", "shop", "store", "official", "genuine", "original",
+            "free shipping", "fast delivery", "best price", "sale", "offer",
+            "deal", "discount", "new", "latest", "2024", "2023"
+        ]
+        
+        # One alternation pass instead of a str.replace per noise word; \b keeps
+        # words like "newton" or "wholesale" intact
+        self._noise_re = re.compile(r'\b(?:' + '|'.join(map(re.escape, self.noise_words)) + r')\b')
+        self._nonword_re = re.compile(r'[^\w\s]')
+        self._whitespace_re = re.compile(r'\s+')
+        self._spam_re = re.compile(r'click here|buy now|limited time')
+        
+        # Popular products recur across searches, so memoize normalization
+        # per name for the lifetime of this (app-wide) instance
+        self._normalize_cached = lru_cache(maxsize=4096)(self._normalize_product_name)
+        
         # Website priority (higher = better source)
         self.website_priority = {
             "apple": 10,
@@ -48,69 +71,77 @@ class DuplicateRemover:
         
         What this does: Finds similar products and keeps only the best one
         Why: Reduces noise and improves user experience
-        Returns: List of unique products
+        Returns: List of unique products (the kept dicts themselves, with
+        "duplicate_info" added in place - callers pass dicts they own)
         """
         if not products:
             return []
         
         logger.info(f"🔍 Starting duplicate removal for {len(products)} products")
         
-        # Step 1: Group similar products
-        product_groups = self._group_similar_products(products)
+        # Step 1: Normalize names and parse prices once per product
+        # Read fields through slotted records instead of repeated dict lookups;
+        # the original dicts are what get returned
+        records = [Product.from_dict(p) for p in products]
+        names = [self._normalize_cached(r.productName) for r in records]
+        prices = [self._extract_numeric_price(r.price) for r in records]
         
-        # Step 2: Select best product from each group
-        unique_products = []
-        for group in product_groups:
-            best_product = self._select_best_product(group)
-            unique_products.append(best_product)
+        # Step 2: Group similar products (as index lists)
+        index_groups = self._group_similar_products(names, prices)
+        
+        # Step 3: Score every product in one vectorized pass
+        scores = self._calculate_product_scores(records, prices)
+        
+        # Step 4: Select best product from each group
+        unique_products = self._select_best_products(products, index_groups, scores, prices)
         
         logger.info(f"✅ Duplicate removal complete: {len(unique_products)} unique products")
         
         return unique_products
     
-    def _group_similar_products(self, products: List[Dict]) -> List[List[Dict]]:
-        """Group products that are likely duplicates"""
-        groups = []
-        used_indices = set()
-        
-        for i, product1 in enumerate(products):
-            if i in used_indices:
-                continue
-            
-            # Start a new group with this product
-            current_group = [product1]
-            used_indices.add(i)
-            
-            # Find similar products
-            for j, product2 in enumerate(products):
-                if j <= i or j in used_indices:
-                    continue
-                
-                if self._are_products_similar(product1, product2):
-                    current_group.append(product2)
-                    used_indices.add(j)
-            
-            groups.append(current_group)
-        
-        logger.debug(f"Grouped {len(products)} products into {len(groups)} groups")
+    def _group_similar_products(self, names: List[str],
+                                prices: List[Optional[float]]) -> List[List[int]]:
+        """Group products that are likely duplicates, returning index groups"""
+        # Score all name pairs in one vectorized call; pairs under the
+        # threshold come back as 0. float32 keeps scores unrounded for the
+        # 0.9 no-price check; N^2 floats is tiny for the tens-to-hundreds of
+        # products a search returns
+        name_scores = process.cdist(
+            names, names,
+            scorer=fuzz.ratio,
+            score_cutoff=self.name_similarity_threshold * 100,
+            dtype=np.float32,
+            workers=-1,
+        )
+        
+        # Union every confirmed (names + prices) candidate pair; transitive
+        # matches (A~B, B~C) end up in one group
+        disjoint_set = DisjointSet(range(len(names)))
+        rows, cols = np.nonzero(np.triu(name_scores, k=1))
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            if self._are_products_similar(i, j, names, prices, name_scores):
+                disjoint_set.merge(i, j)
+        
+        # Keep groups ordered by their first product
+        groups = sorted(sorted(subset) for subset in disjoint_set.subsets())
+        
+        logger.debug(f"Grouped {len(names)} products into {len(groups)} groups")
         return groups
     
-    def _are_products_similar(self, product1: Dict, product2: Dict) -> bool:
-        """Determine if two products are likely duplicates"""
+    def _are_products_similar(self, i: int, j: int, names: List[str],
+                              prices: List[Optional[float]], name_scores: np.ndarray) -> bool:
+        """Determine if products i and j are likely duplicates"""
         
         # Compare product names
-        name1 = self._normalize_product_name(product1.get("productName", ""))
-        name2 = self._normalize_product_name(product2.get("productName", ""))
-        
-        if not name1 or not name2:
+        if not names[i] or not names[j]:
             return False
         
-        name_similarity = SequenceMatcher(None, name1, name2).ratio()
+        name_similarity = name_scores[i, j] / 100.0
         
         # If names are very similar, check prices
         if name_similarity >= self.name_similarity_threshold:
-            price1 = self._extract_numeric_price(product1.get("price", ""))
-            price2 = self._extract_numeric_price(product2.get("price", ""))
+            price1 = prices[i]
+            price2 = prices[j]
             
             if price1 and price2:
                 # Calculate price difference percentage
@@ -131,24 +162,10 @@ class DuplicateRemover:
         if not name:
             return ""
         
-        # Convert to lowercase
-        normalized = name.lower()
-        
-        # Remove common noise words
-        noise_words = [
-            "buy", "online", "shop", "store", "official", "genuine", "original",
-            "free shipping", "fast delivery", "best price", "sale", "offer",
-            "deal", "discount", "new", "latest", "2024", "2023"
-        ]
-        
-        for noise in noise_words:
-            normalized = normalized.replace(noise, "")
-        
-        # Remove extra whitespace and special characters
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        
-        return normalized
+        # Lowercase, drop noise words, then special characters and extra whitespace
+        normalized = self._noise_re.sub(" ", name.lower())
+        normalized = self._nonword_re.sub(" ", normalized)
+        return self._whitespace_re.sub(" ", normalized).strip()
     
     def _extract_numeric_price(self, price_str: str) -> Optional[float]:
         """Extract numeric price value"""
@@ -162,72 +179,84 @@ class DuplicateRemover:
         except (ValueError, TypeError):
             return None
     
-    def _select_best_product(self, product_group: List[Dict]) -> Dict:
-        """Select the best product from a group of duplicates"""
-        if len(product_group) == 1:
-            return product_group[0]
-        
-        # Score each product
-        scored_products = []
-        for product in product_group:
-            score = self._calculate_product_score(product)
-            scored_products.append((score, product))
-        
-        # Sort by score (highest first) and return the best
-        scored_products.sort(key=lambda x: x[0], reverse=True)
-        best_product = scored_products[0][1]
-        
-        # Add metadata about duplicate removal
-        best_product = best_product.copy()
-        best_product["duplicate_info"] = {
-            "total_duplicates_found": len(product_group),
-            "sources_merged": list(set(p.get("website", "Unknown") for p in product_group)),
-            "price_range": {
-                "min": min(self._extract_numeric_price(p.get("price", "0")) or 0 for p in product_group),
-                "max": max(self._extract_numeric_price(p.get("price", "0")) or 0 for p in product_group)
-            }
-        }
+    def _select_best_products(self, products: List[Dict], groups: List[List[int]],
+                              scores: np.ndarray, prices: List[Optional[float]]) -> List[Dict]:
+        """Select the best product from each group of duplicate indices"""
+        # Lay the groups out contiguously so per-group reductions are
+        # segment reductions (ufunc.reduceat) over one array
+        order = np.fromiter((i for group in groups for i in group), dtype=np.intp, count=len(products))
+        sizes = np.fromiter((len(group) for group in groups), dtype=np.intp, count=len(groups))
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        
+        # Best product = first position in each segment holding the segment's
+        # max score (first one wins ties)
+        grouped_scores = scores[order]
+        is_best = grouped_scores == np.repeat(np.maximum.reduceat(grouped_scores, offsets), sizes)
+        positions = np.where(is_best, np.arange(len(order)), len(order))
+        best_indices = order[np.minimum.reduceat(positions, offsets)].tolist()
+        
+        # Price range per group (missing prices count as 0)
+        grouped_prices = np.fromiter((prices[i] or 0 for i in order.tolist()), dtype=np.float64, count=len(order))
+        min_prices = np.minimum.reduceat(grouped_prices, offsets).tolist()
+        max_prices = np.maximum.reduceat(grouped_prices, offsets).tolist()
         
-        logger.debug(f"Selected best product from {len(product_group)} duplicates: {best_product.get('productName', 'Unknown')}")
+        unique_products = []
+        for group, best_index, min_price, max_price in zip(groups, best_indices, min_prices, max_prices):
+            if len(group) == 1:
+                unique_products.append(products[best_index])
+                continue
+            
+            # Add metadata about duplicate removal (in place, see remove_duplicates)
+            best_product = products[best_index]
+            best_product["duplicate_info"] = {
+                "total_duplicates_found": len(group),
+                "sources_merged": list(set(products[i].get("website", "Unknown") for i in group)),
+                "price_range": {
+                    "min": min_price,
+                    "max": max_price
+                }
+            }
+            
+            logger.debug(f"Selected best product from {len(group)} duplicates: {best_product.get('productName', 'Unknown')}")
+            unique_products.append(best_product)
         
-        return best_product
+        return unique_products
     
-    def _calculate_product_score(self, product: Dict) -> float:
-        """Calculate a quality score for a product"""
-        score = 0.0
+    def _calculate_product_scores(self, records: List[Product],
+                                  prices: List[Optional[float]]) -> np.ndarray:
+        """Calculate quality scores for all products as one float64 array"""
+        count = len(records)
+        default_priority = self.website_priority["default"]
         
         # Website priority score (0-10)
-        website = product.get("website", "").lower()
-        website_score = self.website_priority.get(website, self.website_priority["default"])
-        score += website_score
+        website_scores = np.fromiter(
+            (self.website_priority.get(r.website.lower(), default_priority) for r in records),
+            dtype=np.float64, count=count,
+        )
         
         # AI validation score (0-10)
-        if product.get("ai_validated", False):
-            ai_score = (product.get("ai_confidence_score", 0) / 100) * 10
-            score += ai_score
+        ai_scores = np.fromiter(
+            ((r.ai_confidence_score / 100) * 10 if r.ai_validated else 0.0 for r in records),
+            dtype=np.float64, count=count,
+        )
         
         # Data completeness score (0-5)
-        completeness_score = 0
-        if product.get("productName"):
-            completeness_score += 1
-        if product.get("price"):
-            completeness_score += 1
-        if product.get("link") and product["link"].startswith("http"):
-            completeness_score += 1
-        if product.get("image_url"):
-            completeness_score += 1
-        if product.get("rating"):
-            completeness_score += 1
-        
-        score += completeness_score
+        completeness_scores = np.fromiter(
+            (
+                bool(r.productName) + bool(r.price) + r.link.startswith("http")
+                + bool(r.image_url) + bool(r.rating)
+                for r in records
+            ),
+            dtype=np.float64, count=count,
+        )
         
         # Price availability bonus (0-2)
-        if product.get("price") and self._extract_numeric_price(product["price"]):
-            score += 2
+        has_price = np.fromiter((bool(p) for p in prices), dtype=bool, count=count)
         
         # Penalize obvious spam/low quality
-        product_name = product.get("productName", "").lower()
-        if any(spam_word in product_name for spam_word in ["click here", "buy now", "limited time"]):
-            score -= 5
+        is_spam = np.fromiter(
+            (self._spam_re.search(r.productName.lower()) is not None for r in records),
+            dtype=bool, count=count,
+        )
         
-        return score
+        return website_scores + ai_scores + completeness_scores + 2 * has_price - 5 * is_spam
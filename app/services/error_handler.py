@@ -1,7 +1,9 @@
 import logging
-from typing import Dict, List, Any
+import sys
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
 from datetime import datetime
-import traceback
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +17,14 @@ class SearchErrorHandler:
     """
     
     def __init__(self):
-        self.error_counts = {}
+        # Errors record a cheap monotonic timestamp; wall-clock ISO strings are
+        # only built when a summary is requested
+        self._epoch_wall = time.time()
+        self._epoch_ns = time.monotonic_ns()
+        
+        self.error_counts = defaultdict(int)
         self.last_errors = {}
-        self.ai_error_counts = {}
+        self.ai_error_counts = defaultdict(int)
         self.pipeline_stats = {
             "total_searches": 0,
             "successful_searches": 0,
@@ -32,16 +39,14 @@ class SearchErrorHandler:
         error_msg = str(error)
         
         # Update error counts
-        if source not in self.error_counts:
-            self.error_counts[source] = 0
         self.error_counts[source] += 1
         
         # Store last error
         self.last_errors[source] = {
             "error": error_msg,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp_ns": time.monotonic_ns(),
             "context": context or {},
-            "traceback": traceback.format_exc() if logger.isEnabledFor(logging.DEBUG) else None
+            "traceback": self._capture_traceback()
         }
         
         # Log the error
@@ -49,10 +54,18 @@ class SearchErrorHandler:
         if context:
             logger.debug(f"Context: {context}")
     
+    def _capture_traceback(self) -> Optional[str]:
+        """Format the active exception's traceback, only when debugging"""
+        # logger.isEnabledFor is cached by logging itself; format_exc is the
+        # expensive part, and is pointless with no exception being handled
+        if not logger.isEnabledFor(logging.DEBUG) or sys.exc_info()[0] is None:
+            return None
+        
+        import traceback
+        return traceback.format_exc()
+    
     def log_ai_error(self, ai_service: str, error: Exception, query: str = None):
         """Log AI-specific errors"""
-        if ai_service not in self.ai_error_counts:
-            self.ai_error_counts[ai_service] = 0
         self.ai_error_counts[ai_service] += 1
         
         context = {"query": query} if query else {}
@@ -86,11 +99,25 @@ class SearchErrorHandler:
             "total_sources_with_errors": len(self.error_counts),
             "error_counts": self.error_counts,
             "ai_error_counts": self.ai_error_counts,
-            "last_errors": self.last_errors,
+            "last_errors": {
+                source: self._with_iso_timestamp(error)
+                for source, error in self.last_errors.items()
+            },
             "pipeline_stats": self.pipeline_stats,
             "success_rate": self._calculate_success_rate()
         }
     
+    def _fmt_ts(self, timestamp_ns: int) -> str:
+        """Convert a monotonic timestamp to a wall-clock ISO string"""
+        elapsed = (timestamp_ns - self._epoch_ns) / 1e9
+        return datetime.fromtimestamp(self._epoch_wall + elapsed).isoformat()
+    
+    def _with_iso_timestamp(self, error: Dict) -> Dict:
+        """Copy of a stored error with its timestamp formatted for output"""
+        formatted = {k: v for k, v in error.items() if k != "timestamp_ns"}
+        formatted["timestamp"] = self._fmt_ts(error["timestamp_ns"])
+        return formatted
+    
     def _calculate_success_rate(self) -> Dict[str, float]:
         """Calculate success rates for different operations"""
         total_searches = self.pipeline_stats["total_searches"]
@@ -1,12 +1,27 @@
 import os
+import asyncio
+import hashlib
 import logging
-from typing import Dict
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
+from typing import Dict, List, Optional, Union
+
+from app.utils.cache import TwoLayerCache
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
+# One cap on in-flight OpenAI requests for the whole process, shared by
+# OpenAIClient and AIProductValidator
+_request_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_request_semaphore() -> asyncio.Semaphore:
+    """Return the process-wide OpenAI request semaphore (OPENAI_MAX_CONCURRENCY)"""
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(
+            int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        )
+    return _request_semaphore
+
 
 class OpenAIClient:
     """
@@ -18,6 +33,11 @@ class OpenAIClient:
     """
 
     def __init__(self):
+        # Imported here so modules that never build a client skip the cost
+        from openai import AsyncOpenAI
+        from dotenv import load_dotenv
+
+        load_dotenv()
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
@@ -25,6 +45,17 @@ class OpenAIClient:
         self.client = AsyncOpenAI(api_key=self.api_key)
         self.model = "gpt-4o-mini"
 
+        # Completion cache: a small in-process LRU in front of an on-disk
+        # cache that survives restarts and is shared by local workers
+        self.temperature = 0.1
+        self.cache_ttl = 86400
+        self._cache = TwoLayerCache(
+            "OpenAI", os.getenv("OPENAI_CACHE_DIR", "/tmp/openai_cache"), 256
+        )
+
+        # Caps in-flight requests for batched completions
+        self._semaphore = get_request_semaphore()
+
     async def test_connection(self) -> Dict:
         """Test OpenAI API connection"""
         try:
@@ -58,17 +89,63 @@ class OpenAIClient:
             }
 
     async def generate_completion(self, prompt: str, max_tokens: int = 100) -> str:
-        """Generate a completion for a given prompt"""
+        """Generate a completion for a given prompt, served from cache when possible"""
+        cache_key = self._cache_key(prompt, max_tokens)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=max_tokens,
-                temperature=0.1,
+                temperature=self.temperature,
             )
 
-            return response.choices[0].message.content.strip()
+            text = response.choices[0].message.content.strip()
 
         except Exception as e:
             logger.error(f"OpenAI completion failed: {str(e)}")
             raise e
+
+        await self._set_cached(cache_key, text)
+        return text
+
+    def _cache_key(self, prompt: str, max_tokens: int) -> str:
+        """Hash everything that affects the completion into a cache key"""
+        raw = f"{self.model}|{self.temperature}|{max_tokens}|{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _get_cached(self, key: str) -> Optional[str]:
+        """Look up a completion in memory, then on disk"""
+        text = self._cache.get_memory(key)
+        if text is not None:
+            return text
+
+        text = await self._cache.aget_disk(key)
+        if text is not None:
+            self._cache.set_memory(key, text, self.cache_ttl)
+        return text
+
+    async def _set_cached(self, key: str, text: str) -> None:
+        """Store a completion in both cache layers"""
+        self._cache.set_memory(key, text, self.cache_ttl)
+        await self._cache.aset_disk(key, text, self.cache_ttl)
+
+    async def generate_completions_batch(
+        self, prompts: List[str], max_tokens: int = 100
+    ) -> List[Union[str, Exception]]:
+        """Generate completions for many prompts concurrently
+
+        Requests run in parallel up to OPENAI_MAX_CONCURRENCY; results keep
+        the order of prompts, with failed prompts returned as exceptions.
+        """
+
+        async def _one(prompt: str) -> str:
+            async with self._semaphore:
+                return await self.generate_completion(prompt, max_tokens)
+
+        return await asyncio.gather(
+            *(_one(prompt) for prompt in prompts), return_exceptions=True
+        )
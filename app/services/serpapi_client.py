@@ -1,67 +1,278 @@
 import os
-from typing import Dict, List, Optional, Tuple
+import hashlib
+from types import MappingProxyType
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
 import httpx
-from serpapi import GoogleSearch
+import orjson
 from dotenv import load_dotenv
 import asyncio
 import logging
+import random
+import time
+
+from app.utils.cache import TwoLayerCache
 
 # Load environment variables
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+SERPAPI_ACCOUNT_URL = "https://serpapi.com/account.json"
+
+# Top-level response keys the parser reads per engine (plus "error"); the
+# rest (search_metadata, pagination, filters, ...) is dropped before caching
+RESPONSE_FIELDS = {
+    "google_shopping": ("shopping_results",),
+    "amazon": ("organic_results", "products", "search_results"),
+    "google": ("organic_results",),
+    "ebay": ("organic_results", "search_results", "items"),
+}
+
+# Rate limiting and transient upstream failures worth another attempt
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Failures where the request never reached SerpAPI, so a retry can't spend a
+# second credit on a search that is still running upstream
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
 
 class SerpAPIClient:
     """Enhanced client for worldwide product search via SerpAPI"""
 
+    # Simplified and working domain mapping (class-level and read-only, so
+    # every instance shares one copy)
+    AMAZON_DOMAINS: Mapping[str, str] = MappingProxyType({
+        "US": "amazon.com",
+        "IN": "amazon.in",
+        "UK": "amazon.co.uk",
+        "CA": "amazon.ca",
+        "AU": "amazon.com.au",
+        "DE": "amazon.de",
+        "FR": "amazon.fr",
+        "IT": "amazon.it",
+        "ES": "amazon.es",
+    })
+
+    # Simplified local sites for Google search
+    LOCAL_SITES: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+        "US": ("walmart.com", "bestbuy.com", "target.com"),
+        "IN": ("flipkart.com", "snapdeal.com", "myntra.com"),
+        "UK": ("argos.co.uk", "currys.co.uk", "very.co.uk"),
+        "CA": ("canadiantire.ca", "bestbuy.ca"),
+        "AU": ("jbhifi.com.au", "harveynorman.com.au"),
+        "DE": ("otto.de", "mediamarkt.de"),
+        "FR": ("fnac.com", "darty.com"),
+        "IT": ("eprice.it", "unieuro.it"),
+        "ES": ("elcorteingles.es", "mediamarkt.es"),
+    })
+
+    # eBay domain mapping (simplified)
+    EBAY_DOMAINS: Mapping[str, str] = MappingProxyType({
+        "US": "ebay.com",
+        "UK": "ebay.co.uk",
+        "CA": "ebay.ca",
+        "AU": "ebay.com.au",
+        "DE": "ebay.de",
+        "FR": "ebay.fr",
+        "IT": "ebay.it",
+        "ES": "ebay.es",
+    })
+
     def __init__(self):
         self.api_key = os.getenv("SERPAPI_KEY")
         if not self.api_key:
             raise ValueError("SERPAPI_KEY environment variable is required")
 
-        # Simplified and working domain mapping
-        self.amazon_domains = {
-            "US": "amazon.com",
-            "IN": "amazon.in",
-            "UK": "amazon.co.uk",
-            "CA": "amazon.ca",
-            "AU": "amazon.com.au",
-            "DE": "amazon.de",
-            "FR": "amazon.fr",
-            "IT": "amazon.it",
-            "ES": "amazon.es",
-        }
+        # Google Shopping results that let a "fast" search skip the other sources
+        self.fast_mode_min_results = 10
+
+        # Shared HTTP client, created on first use and closed via aclose()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Retry transient failures with jittered exponential backoff; a
+        # Retry-After longer than max_retry_delay isn't worth waiting for
+        # inside the per-source timeout
+        self.max_attempts = 3
+        self.retry_base_delay = 0.2
+        self.max_retry_delay = 2.0
+
+        # Reads may use the whole 15s per-source budget in _bounded (slow
+        # searches are normal and aren't retried); connecting and waiting for a
+        # pooled connection get less so those retries still fit
+        self.request_timeout = httpx.Timeout(15.0, connect=5.0, pool=5.0)
+
+        # Last test_connection result, reused briefly so health probes don't
+        # each hit SerpAPI
+        self.connection_status_ttl = 30
+        self._connection_status: Optional[Tuple[float, Dict]] = None
+
+        # Cap in-flight SerpAPI calls across all searches so bursts queue
+        # here instead of tripping the plan's rate limit
+        self._semaphore = asyncio.Semaphore(
+            int(os.getenv("SERPAPI_MAX_CONCURRENCY", "20"))
+        )
 
-        # Simplified local sites for Google search
-        self.local_sites = {
-            "US": ["walmart.com", "bestbuy.com", "target.com"],
-            "IN": ["flipkart.com", "snapdeal.com", "myntra.com"],
-            "UK": ["argos.co.uk", "currys.co.uk", "very.co.uk"],
-            "CA": ["canadiantire.ca", "bestbuy.ca"],
-            "AU": ["jbhifi.com.au", "harveynorman.com.au"],
-            "DE": ["otto.de", "mediamarkt.de"],
-            "FR": ["fnac.com", "darty.com"],
-            "IT": ["eprice.it", "unieuro.it"],
-            "ES": ["elcorteingles.es", "mediamarkt.es"],
-        }
+        # Response cache keyed by (engine, query, country); concurrent misses
+        # for the same key share one fetch task. Disk entries outlive
+        # cache_ttl until stale_ttl so an expired response can be served
+        # while it is refreshed in the background
+        self.cache_ttl = 3600
+        self.stale_ttl = 86400
+        self._cache = TwoLayerCache(
+            "SerpAPI", os.getenv("SERPAPI_CACHE_DIR", "/tmp/serpapi_cache"), 1024
+        )
+        self._fetching: Dict[str, asyncio.Task] = {}
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared async HTTP client, creating it on first use"""
+        if self._client is None:
+            # Keep warm connections to serpapi.com; with HTTP/2 a search's
+            # concurrent source calls multiplex over one TLS connection
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                timeout=self.request_timeout,
+            )
+        return self._client
+
+    async def _get(self, params: Dict, url: str = SERPAPI_SEARCH_URL) -> Dict:
+        """Run a SerpAPI request (a search by default) and return the decoded JSON body
+
+        SerpAPI reports failures as JSON with an "error" key, so the body is
+        returned regardless of the HTTP status, matching GoogleSearch.get_dict.
+        Responses run to tens of KB, so they are decoded with orjson.
+        RETRYABLE_ERRORS and RETRYABLE_STATUSES are retried up to max_attempts;
+        a read timeout is not, since SerpAPI may still be running the search.
+        """
+        client = await self._get_client()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with self._semaphore:
+                    response = await client.get(url, params=params)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning("SerpAPI request failed (%s), retrying in %.2fs", e, delay)
+            else:
+                if response.status_code not in RETRYABLE_STATUSES or attempt == self.max_attempts:
+                    return orjson.loads(response.content)
+
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                elif delay > self.max_retry_delay:
+                    return orjson.loads(response.content)
+                logger.warning(
+                    "SerpAPI returned %d, retrying in %.2fs", response.status_code, delay
+                )
+
+            await asyncio.sleep(delay)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, capped at max_retry_delay"""
+        ceiling = min(self.retry_base_delay * 2 ** (attempt - 1), self.max_retry_delay)
+        return random.uniform(0, ceiling)
+
+    def _retry_after(self, response: httpx.Response) -> Optional[float]:
+        """Seconds requested by a Retry-After header, if it gives any"""
+        try:
+            return max(float(response.headers["Retry-After"]), 0.0)
+        except (KeyError, ValueError):
+            return None
+
+    async def _cached(self, engine: str, query: str, country: str,
+                      fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Return a cached SerpAPI response, or fetch it once for all callers"""
+        key = self._cache_key(engine, query, country)
+
+        result = self._cache.get_memory(key)
+        if result is not None:
+            return result
 
-        # eBay domain mapping (simplified)
-        self.ebay_domains = {
-            "US": "ebay.com",
-            "UK": "ebay.co.uk",
-            "CA": "ebay.ca",
-            "AU": "ebay.com.au",
-            "DE": "ebay.de",
-            "FR": "ebay.fr",
-            "IT": "ebay.it",
-            "ES": "ebay.es",
+        task = self._fetching.get(key)
+        if task is None:
+            stored = await self._cache.aget_disk(key)
+
+            # Another caller's fetch may have started, or even finished, during
+            # the disk read
+            result = self._cache.get_memory(key)
+            if result is not None:
+                return result
+
+            if stored is not None:
+                fetched_at, result = stored
+                age = time.time() - fetched_at
+                if age < self.cache_ttl:
+                    self._cache.set_memory(key, result, self.cache_ttl - age)
+                    return result
+
+                # Stale: answer with it now and refresh in the background
+                if key not in self._fetching:
+                    self._start_fetch(key, engine, fetch)
+                return result
+
+            task = self._fetching.get(key) or self._start_fetch(key, engine, fetch)
+
+        # Shield so a caller timing out doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _start_fetch(self, key: str, engine: str,
+                     fetch: Callable[[], Awaitable[Dict]]) -> asyncio.Task:
+        """Start fetching a key; the result is cached when the task finishes"""
+        task = asyncio.ensure_future(self._fetch_projected(engine, fetch))
+        self._fetching[key] = task
+        task.add_done_callback(lambda done: self._store(key, done))
+        return task
+
+    async def _fetch_projected(self, engine: str,
+                               fetch: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Fetch a response and keep only the fields used downstream"""
+        result = await fetch()
+        return {
+            key: result[key]
+            for key in ("error",) + RESPONSE_FIELDS[engine]
+            if key in result
         }
 
-    async def search_all_sources(self, query: str, country: str) -> Dict[str, Dict]:
+    def _store(self, key: str, task: asyncio.Task) -> None:
+        """Cache a finished fetch in both layers unless it failed"""
+        self._fetching.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        result = task.result()
+        if "error" in result:
+            return
+
+        self._cache.set_memory(key, result, self.cache_ttl)
+
+        # Done callbacks can't await; hand the blocking SQLite write to the
+        # default executor so it stays off the event loop
+        asyncio.get_running_loop().run_in_executor(
+            None, self._cache.set_disk, key, (time.time(), result), self.stale_ttl
+        )
+
+    def _cache_key(self, engine: str, query: str, country: str) -> str:
+        """Hash the normalized (engine, query, country) into a cache key"""
+        raw = f"{engine}|{query.lower().strip()}|{country.upper()}"
+        return "serp:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search_all_sources(self, query: str, country: str,
+                                 mode: str = "normal") -> Dict[str, Dict]:
         """
         Search all available sources for a product with improved error handling
+
+        In "fast" mode the other sources are cancelled as soon as Google
+        Shopping returns at least fast_mode_min_results products.
         """
-        logger.info(f"Starting comprehensive search for '{query}' in {country}")
+        logger.info("Starting comprehensive search for '%s' in %s", query, country)
 
         # Create search tasks for concurrent execution
         search_tasks = []
@@ -72,7 +283,7 @@ class SerpAPIClient:
         )
 
         # 2. Amazon (only if domain exists and with correct parameters)
-        if country in self.amazon_domains:
+        if country in self.AMAZON_DOMAINS:
             search_tasks.append(("amazon", self.search_amazon_fixed(query, country)))
 
         # 3. Google general search (simplified)
@@ -81,29 +292,85 @@ class SerpAPIClient:
         )
 
         # 4. eBay (with correct parameters)
-        if country in self.ebay_domains:
+        if country in self.EBAY_DOMAINS:
             search_tasks.append(("ebay", self.search_ebay_fixed(query, country)))
 
-        # Execute searches with individual error handling
-        results = {}
+        # Execute searches concurrently, each with its own timeout
+        if mode == "fast":
+            results = await self._search_until_sufficient(search_tasks)
+        else:
+            pairs = await asyncio.gather(
+                *(self._bounded(name, coro) for name, coro in search_tasks)
+            )
+            results = dict(pairs)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Search completed. Working sources: %s",
+                [k for k, v in results.items() if "error" not in v],
+            )
+        return results
 
-        for search_name, search_future in search_tasks:
-            try:
-                logger.info(f"Executing {search_name} search...")
-                result = await asyncio.wait_for(search_future, timeout=15.0)
-                results[search_name] = result
-                logger.info(f"{search_name} search completed")
-            except asyncio.TimeoutError:
-                logger.error(f"{search_name} search timed out")
-                results[search_name] = {"error": "Search timed out"}
-            except Exception as e:
-                logger.error(f"{search_name} search failed: {str(e)}")
-                results[search_name] = {"error": str(e)}
-
-        logger.info(
-            f"Search completed. Working sources: {[k for k, v in results.items() if 'error' not in v]}"
+    async def prewarm(self, pairs: List[Tuple[str, str]], concurrency: int = 5) -> None:
+        """Run searches for popular (query, country) pairs to fill the cache"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(query: str, country: str) -> None:
+            async with semaphore:
+                await self.search_all_sources(query, country)
+
+        logger.info("Prewarming search cache with %d queries", len(pairs))
+        await asyncio.gather(
+            *(warm(query, country) for query, country in pairs), return_exceptions=True
         )
-        return results
+        logger.info("Search cache prewarm complete")
+
+    async def _search_until_sufficient(
+        self, search_tasks: List[Tuple[str, Awaitable[Dict]]]
+    ) -> Dict[str, Dict]:
+        """Collect searches as they finish, stopping once Google Shopping has enough"""
+        tasks = [
+            asyncio.ensure_future(self._bounded(name, coro))
+            for name, coro in search_tasks
+        ]
+
+        results = {}
+        for next_done in asyncio.as_completed(tasks):
+            search_name, result = await next_done
+            results[search_name] = result
+            if (
+                search_name == "google_shopping"
+                and len(result.get("shopping_results", [])) >= self.fast_mode_min_results
+            ):
+                break
+
+        # Cancelled sources still finish their shared fetch in the background
+        # and land in the cache for the next search
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        skipped = [name for name, _ in search_tasks if name not in results]
+        if skipped:
+            logger.info("Fast mode: skipped %s", skipped)
+
+        # Keep the usual source order for the parser
+        return {name: results[name] for name, _ in search_tasks if name in results}
+
+    async def _bounded(self, search_name: str, coro: Awaitable[Dict],
+                       timeout: float = 15.0) -> Tuple[str, Dict]:
+        """Run one search with its own timeout and error handling"""
+        try:
+            logger.info("Executing %s search...", search_name)
+            result = await asyncio.wait_for(coro, timeout=timeout)
+            logger.info("%s search completed", search_name)
+            return search_name, result
+        except asyncio.TimeoutError:
+            logger.error("%s search timed out", search_name)
+            return search_name, {"error": "Search timed out"}
+        except Exception as e:
+            logger.error("%s search failed: %s", search_name, e)
+            return search_name, {"error": str(e)}
 
     async def search_google_shopping(self, query: str, country: str) -> Dict:
         """Google Shopping search - most reliable"""
@@ -117,29 +384,29 @@ class SerpAPIClient:
                 "num": 20,
             }
 
-            logger.info(f"Google Shopping: {query} in {country}")
+            logger.info("Google Shopping: %s in %s", query, country)
 
-            loop = asyncio.get_event_loop()
-            search = GoogleSearch(search_params)
-            result = await loop.run_in_executor(None, search.get_dict)
+            result = await self._cached(
+                "google_shopping", query, country, lambda: self._get(search_params)
+            )
 
             if "error" in result:
-                logger.error(f"Google Shopping API error: {result['error']}")
+                logger.error("Google Shopping API error: %s", result["error"])
                 return {"error": result["error"]}
 
             shopping_results = result.get("shopping_results", [])
-            logger.info(f"Google Shopping: Found {len(shopping_results)} products")
+            logger.info("Google Shopping: Found %d products", len(shopping_results))
 
             return result
 
         except Exception as e:
-            logger.error(f"Google Shopping search failed: {str(e)}")
+            logger.error("Google Shopping search failed: %s", e)
             return {"error": str(e)}
 
     async def search_amazon_fixed(self, query: str, country: str) -> Dict:
         """Fixed Amazon search with correct parameters"""
         try:
-            domain = self.amazon_domains.get(country, "amazon.com")
+            domain = self.AMAZON_DOMAINS.get(country, "amazon.com")
 
             # FIXED: Use 'k' parameter for Amazon search (not 'q')
             search_params = {
@@ -149,29 +416,26 @@ class SerpAPIClient:
                 "api_key": self.api_key,
             }
 
-            logger.info(f"Amazon: {query} on {domain}")
+            logger.info("Amazon: %s on %s", query, domain)
 
-            loop = asyncio.get_event_loop()
-            search = GoogleSearch(search_params)
-            result = await loop.run_in_executor(None, search.get_dict)
+            result = await self._cached(
+                "amazon", query, country, lambda: self._get(search_params)
+            )
 
             if "error" in result:
-                logger.error(f"Amazon API error: {result['error']}")
+                logger.error("Amazon API error: %s", result["error"])
                 return {"error": result["error"]}
 
-            # Check for results in different possible fields
-            organic_results = result.get("organic_results", [])
-            products = result.get("products", [])  # Sometimes Amazon returns 'products'
-
-            if not organic_results and products:
-                result["organic_results"] = products
-                organic_results = products
+            # Sometimes Amazon returns 'products' instead of 'organic_results'
+            organic_results = result["organic_results"] = (
+                result.get("organic_results") or result.get("products") or []
+            )
 
-            logger.info(f"Amazon: Found {len(organic_results)} products")
+            logger.info("Amazon: Found %d products", len(organic_results))
             return result
 
         except Exception as e:
-            logger.error(f"Amazon search failed: {str(e)}")
+            logger.error("Amazon search failed: %s", e)
             return {"error": str(e)}
 
     async def search_google_simple(self, query: str, country: str) -> Dict:
@@ -189,29 +453,29 @@ class SerpAPIClient:
                 "num": 10,  # Fewer results to avoid issues
             }
 
-            logger.info(f"Google general: {enhanced_query}")
+            logger.info("Google general: %s", enhanced_query)
 
-            loop = asyncio.get_event_loop()
-            search = GoogleSearch(search_params)
-            result = await loop.run_in_executor(None, search.get_dict)
+            result = await self._cached(
+                "google", query, country, lambda: self._get(search_params)
+            )
 
             if "error" in result:
-                logger.error(f"Google general API error: {result['error']}")
+                logger.error("Google general API error: %s", result["error"])
                 return {"error": result["error"]}
 
             organic_results = result.get("organic_results", [])
-            logger.info(f"Google general: Found {len(organic_results)} results")
+            logger.info("Google general: Found %d results", len(organic_results))
 
             return result
 
         except Exception as e:
-            logger.error(f"Google general search failed: {str(e)}")
+            logger.error("Google general search failed: %s", e)
             return {"error": str(e)}
 
     async def search_ebay_fixed(self, query: str, country: str) -> Dict:
         """Fixed eBay search with correct parameters"""
         try:
-            domain = self.ebay_domains.get(country, "ebay.com")
+            domain = self.EBAY_DOMAINS.get(country, "ebay.com")
 
             # FIXED: Use '_nkw' parameter for eBay search (not 'q')
             search_params = {
@@ -221,38 +485,44 @@ class SerpAPIClient:
                 "api_key": self.api_key,
             }
 
-            logger.info(f"eBay: {query} on {domain}")
+            logger.info("eBay: %s on %s", query, domain)
 
-            loop = asyncio.get_event_loop()
-            search = GoogleSearch(search_params)
-            result = await loop.run_in_executor(None, search.get_dict)
+            result = await self._cached(
+                "ebay", query, country, lambda: self._get(search_params)
+            )
 
             if "error" in result:
-                logger.error(f"eBay API error: {result['error']}")
+                logger.error("eBay API error: %s", result["error"])
                 return {"error": result["error"]}
 
             organic_results = result.get("organic_results", [])
-            logger.info(f"eBay: Found {len(organic_results)} products")
+            logger.info("eBay: Found %d products", len(organic_results))
 
             return result
 
         except Exception as e:
-            logger.error(f"eBay search failed: {str(e)}")
+            logger.error("eBay search failed: %s", e)
             return {"error": str(e)}
 
     async def test_connection(self) -> Dict:
-        """Test SerpAPI connection"""
-        try:
-            search_params = {
-                "engine": "google",
-                "q": "test",
-                "api_key": self.api_key,
-                "num": 1,
-            }
+        """Test SerpAPI connection
 
-            loop = asyncio.get_event_loop()
-            search = GoogleSearch(search_params)
-            result = await loop.run_in_executor(None, search.get_dict)
+        Uses the account endpoint, which doesn't spend a search credit, and
+        reuses the result for connection_status_ttl seconds.
+        """
+        if self._connection_status is not None:
+            checked_at, status = self._connection_status
+            if time.monotonic() - checked_at < self.connection_status_ttl:
+                return status
+
+        status = await self._check_account()
+        self._connection_status = (time.monotonic(), status)
+        return status
+
+    async def _check_account(self) -> Dict:
+        """Verify the API key against SerpAPI's account endpoint"""
+        try:
+            result = await self._get({"api_key": self.api_key}, url=SERPAPI_ACCOUNT_URL)
 
             if "error" in result:
                 return {
@@ -261,10 +531,17 @@ class SerpAPIClient:
                     "message": "SerpAPI connection failed",
                 }
 
-            return {"connected": True, "message": "SerpAPI connection successful"}
+            return {
+                "connected": True,
+                "message": "SerpAPI connection successful",
+                "account_info": {
+                    "plan": result.get("plan_name"),
+                    "searches_left": result.get("total_searches_left"),
+                },
+            }
 
         except Exception as e:
-            logger.error(f"SerpAPI connection test failed: {str(e)}")
+            logger.error("SerpAPI connection test failed: %s", e)
             return {
                 "connected": False,
                 "error": str(e),
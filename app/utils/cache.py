@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import diskcache
+
+logger = logging.getLogger(__name__)
+
+
+class TwoLayerCache:
+    """
+    Small in-process LRU in front of an on-disk cache
+
+    What this does: Keeps hot entries in memory and everything on disk
+    Why: The disk layer survives restarts and is shared by every worker on
+    the host; the memory layer skips SQLite for repeat hits
+    How: OrderedDict of key -> (expires_at, value) backed by diskcache.Cache
+
+    diskcache is blocking SQLite, so async callers should use aget_disk and
+    aset_disk, which run off the event loop.
+    """
+
+    def __init__(self, name: str, directory: str, memory_size: int):
+        self.name = name
+        self._memory_size = memory_size
+        self._memory = OrderedDict()
+        # A worker holding the SQLite lock shouldn't stall us for diskcache's
+        # default 60s; a lock timeout is treated as a miss / skipped write
+        self._disk = diskcache.Cache(directory, timeout=1)
+
+    def get_memory(self, key: str) -> Optional[Any]:
+        """Look up an unexpired entry in memory"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._memory[key]
+            return None
+
+        self._memory.move_to_end(key)
+        return value
+
+    def set_memory(self, key: str, value: Any, ttl: float) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry"""
+        self._memory[key] = (time.monotonic() + ttl, value)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def get_disk(self, key: str) -> Optional[Any]:
+        """Look up an entry on disk; read failures count as a miss"""
+        try:
+            return self._disk.get(key)
+        except Exception as e:
+            logger.warning("%s disk cache read failed: %r", self.name, e)
+            return None
+
+    def set_disk(self, key: str, value: Any, expire: float) -> None:
+        """Store an entry on disk; write failures are logged and ignored"""
+        try:
+            self._disk.set(key, value, expire=expire)
+        except Exception as e:
+            logger.warning("%s disk cache write failed: %r", self.name, e)
+
+    async def aget_disk(self, key: str) -> Optional[Any]:
+        """get_disk in a worker thread"""
+        return await asyncio.to_thread(self.get_disk, key)
+
+    async def aset_disk(self, key: str, value: Any, expire: float) -> None:
+        """set_disk in a worker thread"""
+        await asyncio.to_thread(self.set_disk, key, value, expire)